@@ -6,26 +6,41 @@ This file exposes a minimal FastAPI application that reuses the project's
 project root to ensure imports like `src` resolve correctly.
 """
 
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Depends
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import anyio.to_thread
+import asyncio
+import csv
+import io
 import os
-from typing import Optional
+from typing import Dict, Iterator, List
 
+from logging_config import configure_logging
 from src.gemini_analyzer import GeminiAnalyzer
 
-_app_analyzer: Optional[GeminiAnalyzer] = None
+CSV_COLUMNS = ["page", "categoria", "descripcion", "score"]
+# Largest chunk_size accepted; bigger chunks would push the request's output cap past the model maximum
+MAX_CHUNK_SIZE = 32
 
 
-def get_analyzer() -> GeminiAnalyzer:
-    global _app_analyzer
-    if _app_analyzer is None:
-        use_real = os.environ.get("USE_REAL_GEMINI", "0") == "1"
-        _app_analyzer = GeminiAnalyzer(use_real=use_real)
-    return _app_analyzer
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Root handler + LOG_LEVEL first, so the analyzer's startup messages already go through it
+    configure_logging()
+    # asyncio.to_thread (PDF parsing) uses the loop's default executor, while UploadFile I/O
+    # goes through anyio's thread limiter; both default to sizes too small for concurrent uploads.
+    size = int(os.environ.get("THREAD_POOL_SIZE", "64"))
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=size, thread_name_prefix="tv"))
+    anyio.to_thread.current_default_thread_limiter().total_tokens = size
+    # One analyzer per process, built before the first request is served
+    app.state.analyzer = GeminiAnalyzer(use_real=os.environ.get("USE_REAL_GEMINI", "0") == "1")
+    yield
 
 
-app = FastAPI(title="Text Validator API")
+app = FastAPI(title="Text Validator API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -40,15 +55,66 @@ async def health():
     return {"status": "ok"}
 
 
+async def _analyze_upload(
+    file: UploadFile, start_page: int, end_page: int, chunk_size: int, analyzer: GeminiAnalyzer
+) -> List[Dict]:
+    if file.content_type != "application/pdf":
+        raise HTTPException(status_code=400, detail="Uploaded file must be a PDF")
+    # Reject impossible ranges before the upload is read or parsed
+    if start_page < 1 or end_page < start_page:
+        raise HTTPException(status_code=400, detail="start_page must be >= 1 and end_page >= start_page")
+    if not 0 <= chunk_size <= MAX_CHUNK_SIZE:
+        raise HTTPException(status_code=400, detail=f"chunk_size must be between 0 and {MAX_CHUNK_SIZE}")
+    try:
+        # file.file is Starlette's SpooledTemporaryFile: in memory for small uploads, on disk for large ones
+        if chunk_size:
+            # Up to chunk_size pages per Gemini request instead of one request per page
+            return await analyzer.analyze_pdf_chunked_async(file.file, start_page, end_page, chunk_size)
+        return await analyzer.analyze_pdf_pages_async(file.file, start_page, end_page)
+    finally:
+        await file.close()
+
+
+def _iter_csv(results: List[Dict]) -> Iterator[str]:
+    """Yield the findings as CSV one line at a time, reusing a single small buffer."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+
+    def flush() -> str:
+        line = buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+        return line
+
+    writer.writerow(CSV_COLUMNS)
+    yield flush()
+    for page in results:
+        for f in page["findings"]:
+            writer.writerow([page["page"], f.get("categoria", ""), f.get("descripcion", ""), f.get("score", "")])
+            yield flush()
+
+
 @app.post("/api/v1/validate")
 async def validate_pdf(
     file: UploadFile = File(...),
     start_page: int = Form(1),
     end_page: int = Form(3),
-    analyzer: GeminiAnalyzer = Depends(get_analyzer),
+    chunk_size: int = Form(0),
 ):
-    if file.content_type != "application/pdf":
-        raise HTTPException(status_code=400, detail="Uploaded file must be a PDF")
-    content = await file.read()
-    results = await run_in_threadpool(analyzer.analyze_pdf_pages, content, start_page, end_page)
-    return {"results": results}
\ No newline at end of file
+    results = await _analyze_upload(file, start_page, end_page, chunk_size, app.state.analyzer)
+    return {"results": results}
+
+
+@app.post("/api/v1/validate/csv")
+async def validate_pdf_csv(
+    file: UploadFile = File(...),
+    start_page: int = Form(1),
+    end_page: int = Form(3),
+    chunk_size: int = Form(0),
+):
+    results = await _analyze_upload(file, start_page, end_page, chunk_size, app.state.analyzer)
+    return StreamingResponse(
+        _iter_csv(results),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="hallazgos.csv"'},
+    )
@@ -3,9 +3,16 @@
 import os
 import sys
 import json
+import time
 import logging
 from datetime import datetime
 
+# orjson es opcional: serializa ~5-10x más rápido que json y ya emite UTF-8
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Variable global para evitar mensajes duplicados
 _environment_logged = False
 
@@ -44,14 +51,21 @@ class SmartFormatter(logging.Formatter):
     def __init__(self):
         super().__init__()
         self.use_json = is_cloud_run()
+        self._severity = self.SEVERITY_MAPPING.get
     
     def format(self, record):
+        # Sin args no hace falta pasar por el formateo con %
+        if not record.args and isinstance(record.msg, str):
+            message = record.msg
+        else:
+            message = record.getMessage()
+        
         if self.use_json:
             # Cloud Run: JSON con severity
             log_entry = {
-                'severity': self.SEVERITY_MAPPING.get(record.levelname, 'INFO'),
-                'message': record.getMessage(),
-                'timestamp': datetime.utcnow().isoformat() + 'Z',
+                'severity': self._severity(record.levelname, 'INFO'),
+                'message': message,
+                'timestamp': '%s.%03dZ' % (time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)), record.msecs),
                 'logger': record.name,
                 'module': record.module,
                 'function': record.funcName,
@@ -61,18 +75,31 @@ class SmartFormatter(logging.Formatter):
             if record.exc_info:
                 log_entry['exception'] = self.formatException(record.exc_info)
             
+            if orjson is not None:
+                return orjson.dumps(log_entry).decode()
             return json.dumps(log_entry, ensure_ascii=False)
         else:
             # Local: Formato legible CON timestamp
             timestamp = datetime.fromtimestamp(record.created).strftime('%Y-%m-%d %H:%M:%S')
-            return f"{timestamp} - {record.levelname} - {record.name} - {record.getMessage()}"
+            return f"{timestamp} - {record.levelname} - {record.name} - {message}"
+
+def get_log_level():
+    """Nivel de log desde LOG_LEVEL (default: INFO)"""
+    level = logging.getLevelName(os.environ.get("LOG_LEVEL", "INFO").upper())
+    return level if isinstance(level, int) else logging.INFO
 
 def configure_logging():
-    """Configura el logging automáticamente para todo el proyecto"""
+    """
+    Configura el logging automáticamente para todo el proyecto.
+    
+    El nivel se aplica en el logger raíz: los registros por debajo del umbral
+    se descartan en Logger.isEnabledFor, antes de crear el LogRecord o llegar al formatter.
+    """
+    level = get_log_level()
     
     # Obtener el root logger
     root_logger = logging.getLogger()
-    root_logger.setLevel(logging.INFO)
+    root_logger.setLevel(level)
     
     # Limpiar handlers existentes
     root_logger.handlers.clear()
@@ -80,7 +107,7 @@ def configure_logging():
     # Configurar handler con el formatter inteligente
     handler = logging.StreamHandler(sys.stdout)
     handler.setFormatter(SmartFormatter())
-    handler.setLevel(logging.INFO)
+    handler.setLevel(level)
     handler.flush = sys.stdout.flush
     
     root_logger.addHandler(handler)
\ No newline at end of file
@@ -1,7 +1,24 @@
 # src.__init__.py
 
-from .gemini_analyzer import GeminiAnalyzer
-from .report_generator import ReportGenerator
+import importlib
 
 __version__ = "1.0.0"
-__all__ = ['GeminiAnalyzer', 'ReportGenerator']
\ No newline at end of file
+__all__ = ['GeminiAnalyzer', 'ReportGenerator']
+
+# Carga diferida (PEP 562): `from src import GeminiAnalyzer` no importa ReportGenerator y viceversa
+_LAZY_IMPORTS = {
+    'GeminiAnalyzer': '.gemini_analyzer',
+    'ReportGenerator': '.report_generator',
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_IMPORTS:
+        value = getattr(importlib.import_module(_LAZY_IMPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
\ No newline at end of file
@@ -1,13 +1,18 @@
+import asyncio
+import functools
+import hashlib
 import io
 import json
 import logging
 import os
 import re
-from typing import List, Dict, Optional, Any
+import threading
+from collections import OrderedDict
+from typing import BinaryIO, Callable, List, Dict, Optional, Any, Tuple, Union
 
 logger = logging.getLogger("GeminiAnalyzer")
 logger.addHandler(logging.NullHandler())
-logger.setLevel(logging.INFO)
+# No explicit level: it follows the root logger (LOG_LEVEL), so disabled levels are skipped before formatting
 
 # Try optional imports for real Gemini integration
 try:
@@ -17,33 +22,186 @@ except Exception:
     genai = None  # type: ignore
     REAL_GENAI_AVAILABLE = False
 
-# Try to import PyPDF2 to extract pages/text
 try:
-    from PyPDF2 import PdfReader, PdfWriter  # type: ignore
+    from google.genai import errors as genai_errors  # type: ignore
+    from google.genai import types as genai_types  # type: ignore
+except Exception:
+    genai_errors = None  # type: ignore
+    genai_types = None  # type: ignore
+
+# tenacity is optional: retries transient Vertex AI errors (429/5xx) instead of losing the page
+try:
+    from tenacity import AsyncRetrying, Retrying, retry_if_exception, stop_after_attempt, wait_exponential  # type: ignore
+    HAS_TENACITY = True
+except Exception:
+    HAS_TENACITY = False
+
+# google-genai talks to Vertex AI over httpx; connection drops and timeouts surface as its transport errors
+try:
+    import httpx  # type: ignore
+except Exception:
+    httpx = None  # type: ignore
+
+_TRANSIENT_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+def _is_transient_error(exc: BaseException) -> bool:
+    """Rate limits, server hiccups and network errors are worth retrying; bad requests and safety blocks are not."""
+    if httpx is not None and isinstance(exc, httpx.TransportError):
+        return True
+    return (
+        genai_errors is not None
+        and isinstance(exc, genai_errors.APIError)
+        and getattr(exc, "code", None) in _TRANSIENT_STATUS_CODES
+    )
+
+# Try to import pypdf (maintained PyPDF2 fork, same API) or PyPDF2 to extract page text
+try:
+    from pypdf import PdfReader  # type: ignore
     HAS_PYPDF2 = True
 except Exception:
-    PdfReader = None  # type: ignore
-    PdfWriter = None  # type: ignore
-    HAS_PYPDF2 = False
-    logger.debug("PyPDF2 not available — PDF text extraction will be limited.")
+    try:
+        from PyPDF2 import PdfReader  # type: ignore
+        HAS_PYPDF2 = True
+    except Exception:
+        PdfReader = None  # type: ignore
+        HAS_PYPDF2 = False
+        logger.debug("pypdf/PyPDF2 not available — PDF text extraction will be limited.")
+
+# orjson is optional: faster parsing of the (potentially large) JSON responses
+try:
+    import orjson  # type: ignore
+    _json_loads = orjson.loads
+except Exception:
+    orjson = None  # type: ignore
+    _json_loads = json.loads
+
+# diskcache is optional: persists model responses across runs when GEMINI_CACHE_DIR is set
+try:
+    import diskcache  # type: ignore
+    HAS_DISKCACHE = True
+except Exception:
+    diskcache = None  # type: ignore
+    HAS_DISKCACHE = False
+
+# PyMuPDF is optional: C text extraction straight from the open document, no per-page PDF round-trip
+try:
+    import pymupdf  # type: ignore
+    HAS_PYMUPDF = True
+except Exception:
+    pymupdf = None  # type: ignore
+    HAS_PYMUPDF = False
+
+# pypdfium2 is optional: permissively licensed C text extraction, used when PyMuPDF (AGPL) isn't installed
+try:
+    import pypdfium2 as pdfium  # type: ignore
+    HAS_PDFIUM = True
+except Exception:
+    pdfium = None  # type: ignore
+    HAS_PDFIUM = False
+
+
+class _PyMuPDFDoc:
+    """
+    PyMuPDF document behind the small interface used here (page_count, page_text, close, with).
+    MuPDF is not thread-safe and pages are read from executor threads, so every call goes through one lock.
+    """
+    _lock = threading.Lock()
+
+    def __init__(self, pdf_bytes: bytes):
+        with self._lock:
+            self._doc = pymupdf.open(stream=pdf_bytes, filetype="pdf")
+            self.page_count = self._doc.page_count
+
+    def page_text(self, index: int) -> str:
+        with self._lock:
+            return self._doc[index].get_text()
+
+    def close(self):
+        with self._lock:
+            self._doc.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _PdfiumDoc:
+    """
+    pypdfium2 document with the same interface as _PyMuPDFDoc.
+    PDFium is not thread-safe either, so it gets its own process-wide lock.
+    """
+    _lock = threading.Lock()
+
+    def __init__(self, pdf_bytes: bytes):
+        with self._lock:
+            self._doc = pdfium.PdfDocument(pdf_bytes)
+            self.page_count = len(self._doc)
+
+    def page_text(self, index: int) -> str:
+        with self._lock:
+            page = self._doc[index]
+            textpage = page.get_textpage()
+            try:
+                # PDFium ends lines with \r\n; match the other backends
+                return textpage.get_text_range().replace("\r\n", "\n")
+            finally:
+                textpage.close()
+                page.close()
+
+    def close(self):
+        with self._lock:
+            self._doc.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
 
 class GeminiAnalyzer:
     """
     Analyzer that can use Google GenAI (Gemini) when available, otherwise runs a local mock analysis.
     Public methods:
-      - analyze_pdf_pages(pdf_input: bytes|path, start_page: int, end_page: int) -> List[Dict]
-      - analyze_single_page(pdf_input: bytes|path, page_num: int) -> List[Dict]
+      - analyze_pdf_pages(pdf_input: bytes|path|file-like, start_page: int, end_page: int) -> List[Dict]
+      - analyze_pdf_pages_async(pdf_input: bytes|path|file-like, start_page: int, end_page: int) -> List[Dict]
+      - analyze_single_page(pdf_input: bytes|path|file-like, page_num: int) -> List[Dict]
+      - analyze_pdf_chunked(pdf_input: bytes|path|file-like, start_page: int, end_page: int, chunk_size: int) -> List[Dict]
+      - analyze_pdf_chunked_async(pdf_input: bytes|path|file-like, start_page: int, end_page: int, chunk_size: int) -> List[Dict]
     """
 
-    CATEGORIAS_VALIDAS = {
+    CATEGORIAS_VALIDAS = frozenset({
         "sesgo_genero",
         "sesgo_religion",
         "sesgo_politica",
         "ortografia",
         "gramatica",
         "semantica",
-    }
+    })
+
+    # Output budget per analyzed page; a page's findings rarely need more than a few hundred tokens
+    MAX_OUTPUT_TOKENS = 2048
+    # Hard output limit of the Gemini 2.5 models; larger max_output_tokens values are rejected with a 400
+    MODEL_MAX_OUTPUT_TOKENS = 65536
+    # Thinking tokens for the fallback model, on top of its output budget; gemini-2.5-pro always thinks and
+    # those tokens count toward max_output_tokens, so without this the JSON answer gets truncated
+    FALLBACK_THINKING_BUDGET = 1024
+    # Attempts per Gemini request when the error is transient (see _is_transient_error)
+    RETRY_ATTEMPTS = 4
+    # Part of every response cache key: bump whenever _build_system_prompt or the page prompts change
+    PROMPT_VERSION = "1"
+    # Responses kept in the in-process LRU
+    RESPONSE_CACHE_SIZE = 512
+    # Extracted page texts kept in memory, so re-analyzing the same PDF skips text extraction
+    TEXT_CACHE_SIZE = 1024
+    # Mock heuristics: substring matches ("politic" also catches "political"), one scan per category
+    _RELIGION_RE = re.compile("religion|christian|muslim|jewish|buddhist|church|mosque")
+    _POLITICS_RE = re.compile("vote|politic|party|president|congress|senate|policy")
+    _MALE_WORDS = frozenset({"he", "him", "his", "man", "men", "boys"})
+    _FEMALE_WORDS = frozenset({"she", "her", "hers", "woman", "women", "girls"})
 
     def __init__(
         self,
@@ -51,15 +209,44 @@ class GeminiAnalyzer:
         location: Optional[str] = None,
         model_name: Optional[str] = None,
         use_real: bool = True,
+        concurrency: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+        fallback_model_name: Optional[str] = None,
     ):
         # read defaults from environment if not provided
         self.project_id = project_id or os.environ.get("GCP_PROJECT_ID")
         self.location = location or os.environ.get("GCP_LOCATION", "us-east1")
-        self.model_name = model_name or os.environ.get("GEMINI_MODEL", "models/text-bison@001")
+        self.model_name = model_name or os.environ.get("GEMINI_MODEL", "gemini-2.5-flash-lite")
+        # second tier, only for pages the primary model returns nothing for (e.g. blocked) or can't parse
+        self.fallback_model_name = fallback_model_name or os.environ.get("GEMINI_FALLBACK_MODEL", "gemini-2.5-pro")
+        # max pages (or chunks) analyzed at once; at least 1, since a zero-slot semaphore would block forever
+        self.concurrency = max(1, concurrency or int(os.environ.get("GEMINI_CONCURRENCY", "8")))
         # enable real only if user wants and library seems available
         self.want_real = bool(use_real)
         self.real_available = REAL_GENAI_AVAILABLE and self.want_real
         self._client: Optional[Any] = None
+        # (prompt, config, model_name) -> text, bound once to whichever call pattern the client supports
+        self._sync_call: Optional[Callable[[str, Optional[Any], str], Optional[str]]] = None
+        self._async_call: Optional[Callable[[str, Optional[Any], str], Any]] = None
+        # Event loop (on its own daemon thread) shared by every call to the sync wrappers
+        self._sync_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sync_loop_lock = threading.Lock()
+        # Static per instance: built once instead of on every request
+        self._system_prompt = self._build_system_prompt()
+        self._response_schema = self._get_response_schema()
+        self._config_cache: Dict[tuple, Any] = {}
+        # Model responses keyed by (prompt version, model, prompt): in-process LRU + optional disk tier
+        self._response_cache: "OrderedDict[str, str]" = OrderedDict()
+        self._response_cache_lock = threading.Lock()
+        # Page text keyed by (PDF digest, page number)
+        self._text_cache: "OrderedDict[Tuple[bytes, int], str]" = OrderedDict()
+        self._text_cache_lock = threading.Lock()
+        self._disk_cache = None
+        cache_dir = cache_dir or os.environ.get("GEMINI_CACHE_DIR")
+        if cache_dir and HAS_DISKCACHE:
+            self._disk_cache = diskcache.Cache(cache_dir)
+        elif cache_dir:
+            logger.warning("GEMINI_CACHE_DIR is set but diskcache is not installed; using the in-process cache only.")
         self._initialize_client()
 
     def _initialize_client(self):
@@ -72,43 +259,186 @@ class GeminiAnalyzer:
             return
 
         try:
-            # store module ref; real calls performed in _call_gemini
-            self._client = genai
+            # Prefer a Vertex AI client (exposes the async `aio` surface); otherwise keep the module ref
+            if hasattr(genai, "Client"):
+                self._client = genai.Client(vertexai=True, project=self.project_id, location=self.location)
+            else:
+                self._client = genai
             logger.info("google-genai library found; GeminiAnalyzer will attempt real calls.")
         except Exception as exc:
             logger.exception("Failed to initialize google-genai client; falling back to mock: %s", exc)
             self.real_available = False
             self._client = None
+            return
+        self._bind_call_patterns()
+
+    def _bind_call_patterns(self):
+        """
+        Resolve how to call the client once, instead of probing it with hasattr on every request.
+        Legacy helpers take no config: the instructions travel in the prompt itself.
+        """
+        client = self._client
+        self._sync_call = self._async_call = None
+        if hasattr(client, "models"):
+            generate = client.models.generate_content
+            if HAS_TENACITY:
+                generate = Retrying(**self._retry_policy()).wraps(generate)
+
+            def call(prompt, config, model_name):
+                return getattr(generate(model=model_name, contents=prompt, config=config), "text", None)
+            self._sync_call = call
+        elif hasattr(client, "generate_text"):
+            # Preferred simple helper if available
+            def call(prompt, config, model_name):
+                resp = client.generate_text(model=model_name, input=f"{self._system_prompt}\n\n{prompt}")
+                text = getattr(resp, "text", None) or getattr(resp, "output", None)
+                if isinstance(text, list):
+                    return text[0] if text else None
+                return text
+            self._sync_call = call
+        elif hasattr(client, "TextGenerationModel"):
+            def call(prompt, config, model_name):
+                model = client.TextGenerationModel.from_pretrained(model_name)  # type: ignore
+                out = model.generate(f"{self._system_prompt}\n\n{prompt}")
+                if hasattr(out, "text"):
+                    return out.text
+                if hasattr(out, "candidates"):
+                    return getattr(out.candidates[0], "content", None)
+                return None
+            self._sync_call = call
+        elif hasattr(client, "generate"):
+            def call(prompt, config, model_name):
+                resp = client.generate(model=model_name, prompt=f"{self._system_prompt}\n\n{prompt}")
+                return getattr(resp, "output", None) or getattr(resp, "text", None)
+            self._sync_call = call
+
+        if hasattr(client, "aio"):
+            generate_async = client.aio.models.generate_content
+            if HAS_TENACITY:
+                generate_async = AsyncRetrying(**self._retry_policy()).wraps(generate_async)
+
+            async def call_async(prompt, config, model_name):
+                resp = await generate_async(model=model_name, contents=prompt, config=config)
+                return getattr(resp, "text", None)
+            self._async_call = call_async
+
+        if self._sync_call is None:
+            logger.warning("google-genai client has no known call pattern; GeminiAnalyzer running in mock mode.")
+            self.real_available = False
+
+    def _generation_config(self, pages: int = 1, json_output: bool = False, model_name: Optional[str] = None):
+        """
+        Per-request config carrying the system prompt.
+        The output cap scales with the number of pages in the request, up to the model maximum.
+        json_output adds the response schema.
+        Any model other than self.model_name is the fallback: it gets a fixed thinking budget and that much
+        extra room in the output cap.
+        Configs are built (and validated into GenerateContentConfig) once per distinct shape and then reused.
+        """
+        is_fallback = model_name not in (None, self.model_name)
+        key = (pages, json_output, is_fallback)
+        config = self._config_cache.get(key)
+        if config is not None:
+            return config
+
+        max_output_tokens = self.MAX_OUTPUT_TOKENS * pages
+        if is_fallback:
+            max_output_tokens += self.FALLBACK_THINKING_BUDGET
+        config = {"max_output_tokens": min(max_output_tokens, self.MODEL_MAX_OUTPUT_TOKENS)}
+        if json_output:
+            config["response_mime_type"] = "application/json"
+            config["response_schema"] = self._response_schema
+        config["system_instruction"] = self._system_prompt
+        if genai_types is not None:
+            if json_output:
+                config["response_schema"] = genai_types.Schema.model_validate(self._response_schema)
+            if is_fallback:
+                config["thinking_config"] = genai_types.ThinkingConfig(thinking_budget=self.FALLBACK_THINKING_BUDGET)
+            config = genai_types.GenerateContentConfig(**config)
+        self._config_cache[key] = config
+        return config
 
     # -------------------------
-    # PDF helpers (PyPDF2)
+    # PDF helpers (PyMuPDF / pypdfium2 / pypdf)
     # -------------------------
-    def _extract_single_page_pdf(self, pdf_bytes: bytes, page_num: int) -> bytes:
+    def _open_reader(self, pdf_bytes: bytes):
+        """Parse the document once; None when pypdf/PyPDF2 is missing or the PDF can't be read."""
         if not HAS_PYPDF2:
-            return pdf_bytes
+            return None
         try:
-            reader = PdfReader(io.BytesIO(pdf_bytes))
-            if page_num < 1 or page_num > len(reader.pages):
-                raise IndexError("page_num out of range")
-            writer = PdfWriter()
-            writer.add_page(reader.pages[page_num - 1])
-            out = io.BytesIO()
-            writer.write(out)
-            out.seek(0)
-            return out.read()
+            return PdfReader(io.BytesIO(pdf_bytes), strict=False)
+        except Exception as e:
+            logger.exception("Error reading PDF bytes: %s", e)
+            return None
+
+    def _count_pages(self, reader) -> int:
+        """Page count from the trailer's /Pages /Count, avoiding the page-tree flattening len(reader.pages) does."""
+        try:
+            return int(reader.trailer["/Root"]["/Pages"].get_object()["/Count"])
+        except Exception:
+            return len(reader.pages)
+
+    def _open_text_doc(self, pdf_bytes: bytes):
+        """
+        Document to read page text from directly: PyMuPDF, else pypdfium2.
+        None means extracting with the pypdf reader instead.
+        """
+        if HAS_PYMUPDF:
+            try:
+                return _PyMuPDFDoc(pdf_bytes)
+            except Exception as e:
+                logger.debug("PyMuPDF could not open the PDF: %s", e)
+        if HAS_PDFIUM:
+            try:
+                return _PdfiumDoc(pdf_bytes)
+            except Exception as e:
+                logger.debug("pypdfium2 could not open the PDF: %s", e)
+        return None
+
+    def _page_text(self, text_doc, page_num: int) -> str:
+        try:
+            return text_doc.page_text(page_num - 1).strip()
         except Exception as e:
-            logger.debug("extract_single_page_pdf failed: %s", e)
-            return pdf_bytes
+            logger.debug("page_text failed: %s", e)
+            return ""
+
+    def _reader_page_text(self, reader, page_num: int) -> str:
+        try:
+            return (reader.pages[page_num - 1].extract_text() or "").strip()
+        except Exception as e:
+            logger.debug("reader_page_text failed: %s", e)
+            return ""
+
+    @staticmethod
+    def _pdf_digest(pdf_bytes: bytes) -> bytes:
+        return hashlib.blake2b(pdf_bytes, digest_size=16).digest()
+
+    def _cached_page_text(self, digest: bytes, page_num: int, extract: Callable[[int], str]) -> str:
+        """Page text from the in-process LRU; extract(page_num) runs (and is cached) only on a miss."""
+        key = (digest, page_num)
+        with self._text_cache_lock:
+            if key in self._text_cache:
+                self._text_cache.move_to_end(key)
+                return self._text_cache[key]
+        text = extract(page_num)
+        with self._text_cache_lock:
+            self._text_cache[key] = text
+            if len(self._text_cache) > self.TEXT_CACHE_SIZE:
+                self._text_cache.popitem(last=False)
+        return text
 
     def _read_text_from_pdf_bytes(self, pdf_bytes: bytes) -> str:
+        text_doc = self._open_text_doc(pdf_bytes)
+        if text_doc is not None:
+            with text_doc:
+                return self._page_text(text_doc, 1) if text_doc.page_count else ""
         if not HAS_PYPDF2:
             return ""
         try:
             reader = PdfReader(io.BytesIO(pdf_bytes))
             if not reader.pages:
                 return ""
-            page = reader.pages[0]
-            return (page.extract_text() or "").strip()
+            return self._reader_page_text(reader, 1)
         except Exception as e:
             logger.debug("read_text_from_pdf_bytes failed: %s", e)
             return ""
@@ -116,69 +446,139 @@ class GeminiAnalyzer:
     # -------------------------
     # Real Gemini call wrapper
     # -------------------------
-    def _call_gemini(self, prompt: str, max_output_tokens: int = 512) -> Optional[str]:
+    def _retry_policy(self) -> Dict:
+        return {
+            "stop": stop_after_attempt(self.RETRY_ATTEMPTS),
+            "wait": wait_exponential(multiplier=1, max=20),
+            "retry": retry_if_exception(_is_transient_error),
+            "reraise": True,
+        }
+
+    def _response_cache_key(self, prompt: str, model_name: str) -> str:
+        return hashlib.sha256(f"{self.PROMPT_VERSION}\0{model_name}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def _cache_get(self, key: str) -> Optional[str]:
+        with self._response_cache_lock:
+            if key in self._response_cache:
+                self._response_cache.move_to_end(key)
+                return self._response_cache[key]
+        if self._disk_cache is not None:
+            value = self._disk_cache.get(key)
+            if value is not None:
+                self._cache_put(key, value, persist=False)
+            return value
+        return None
+
+    def _cache_put(self, key: str, value: str, persist: bool = True):
+        with self._response_cache_lock:
+            self._response_cache[key] = value
+            self._response_cache.move_to_end(key)
+            if len(self._response_cache) > self.RESPONSE_CACHE_SIZE:
+                self._response_cache.popitem(last=False)
+        if persist and self._disk_cache is not None:
+            self._disk_cache.set(key, value)
+
+    def _call_gemini(
+        self, prompt: str, config: Optional[Any] = None, model_name: Optional[str] = None
+    ) -> Optional[str]:
         if not self.real_available or self._client is None:
             return None
 
-        try:
-            # Preferred simple helper if available
-            if hasattr(self._client, "generate_text"):
-                resp = self._client.generate_text(model=self.model_name, input=prompt)
-                text = getattr(resp, "text", None) or getattr(resp, "output", None)
-                if isinstance(text, list):
-                    return text[0] if text else None
-                return text
-            if hasattr(self._client, "TextGenerationModel"):
-                Model = getattr(self._client, "TextGenerationModel")
-                model = Model.from_pretrained(self.model_name)  # type: ignore
-                out = model.generate(prompt)
-                if hasattr(out, "text"):
-                    return out.text
-                if hasattr(out, "candidates"):
-                    return getattr(out.candidates[0], "content", None)
-            if hasattr(self._client, "generate"):
-                resp = self._client.generate(model=self.model_name, prompt=prompt)
-                return getattr(resp, "output", None) or getattr(resp, "text", None)
-        except Exception as e:
-            logger.exception("Real Gemini call failed, falling back to mock: %s", e)
-            self.real_available = False
+        model_name = model_name or self.model_name
+        key = self._response_cache_key(prompt, model_name)
+        output = self._cache_get(key)
+        if output is None:
+            output = self._generate(prompt, config, model_name)
+            if output:
+                self._cache_put(key, output)
+        return output
+
+    def _generate(self, prompt: str, config: Optional[Any] = None, model_name: Optional[str] = None) -> Optional[str]:
+        # Errors (after retries) propagate to the page or chunk being analyzed; the analyzer stays in real mode
+        return self._sync_call(prompt, config, model_name or self.model_name)
+
+    async def _call_gemini_async(
+        self,
+        prompt: str,
+        config: Optional[Any] = None,
+        model_name: Optional[str] = None,
+        parse: Optional[Callable[[str], Any]] = None,
+    ) -> Any:
+        """
+        Model output for prompt, from the response cache when possible.
+        With parse, returns parse(output) instead, and only outputs it accepts (not None) are cached.
+        """
+        if not self.real_available or self._client is None:
             return None
 
-        logger.debug("google-genai available but no known call pattern matched; falling back to mock.")
-        return None
+        model_name = model_name or self.model_name
+        key = self._response_cache_key(prompt, model_name)
+        # Disk-cache I/O would block the event loop; the in-process LRU alone is cheap enough inline
+        on_disk = self._disk_cache is not None
+        output = await asyncio.to_thread(self._cache_get, key) if on_disk else self._cache_get(key)
+        if output is not None:
+            return parse(output) if parse is not None else output
+
+        if self._async_call is not None:
+            output = await self._generate_async(prompt, config, model_name)
+        else:
+            # Legacy call patterns have no async surface
+            output = await asyncio.to_thread(self._generate, prompt, config, model_name)
+        if not output:
+            return None
+        result = parse(output) if parse is not None else output
+        if result is not None:
+            if on_disk:
+                await asyncio.to_thread(self._cache_put, key, output)
+            else:
+                self._cache_put(key, output)
+        return result
+
+    async def _generate_async(
+        self, prompt: str, config: Optional[Any] = None, model_name: Optional[str] = None
+    ) -> Optional[str]:
+        return await self._async_call(prompt, config, model_name or self.model_name)
 
     # -------------------------
     # Mock heuristics (keeps previous behavior)
     # -------------------------
     def _mock_analyze_text(self, text: str, page_num: int) -> List[Dict]:
+        if not text:
+            # Blank page (page text arrives stripped): the length check below is the only one that can fire
+            return [{
+                "categoria": "semantica",
+                "descripcion": "Contenido muy corto — posible falta de información contextual.",
+                "score": 0.6
+            }]
+
         findings = []
-        lower = (text or "").lower()
+        lower = text.lower()
+        # Tokenized once; the gender and semantic checks below all reuse these
+        tokens = lower.split()
+        token_set = set(tokens)
 
-        male_words = {"he", "him", "his", "man", "men", "boys"}
-        female_words = {"she", "her", "hers", "woman", "women", "girls"}
-        words = set(lower.split())
-        if words & male_words and not (words & female_words):
+        has_male = not token_set.isdisjoint(self._MALE_WORDS)
+        has_female = not token_set.isdisjoint(self._FEMALE_WORDS)
+        if has_male and not has_female:
             findings.append({
                 "categoria": "sesgo_genero",
                 "descripcion": "Predominio de referencias masculinas sin balance.",
                 "score": 0.6
             })
-        if words & female_words and not (words & male_words):
+        if has_female and not has_male:
             findings.append({
                 "categoria": "sesgo_genero",
                 "descripcion": "Predominio de referencias femeninas sin balance.",
                 "score": 0.6
             })
 
-        religion_terms = {"religion", "christian", "muslim", "jewish", "buddhist", "church", "mosque"}
-        politics_terms = {"vote", "politic", "party", "president", "congress", "senate", "policy"}
-        if any(t in lower for t in religion_terms):
+        if self._RELIGION_RE.search(lower):
             findings.append({
                 "categoria": "sesgo_religion",
                 "descripcion": "Referencias religiosas detectadas que podrían implicar sesgo.",
                 "score": 0.5
             })
-        if any(t in lower for t in politics_terms):
+        if self._POLITICS_RE.search(lower):
             findings.append({
                 "categoria": "sesgo_politica",
                 "descripcion": "Referencias políticas detectadas.",
@@ -192,22 +592,21 @@ class GeminiAnalyzer:
                 "score": 0.3
             })
 
-        sentences = [s for s in text.replace("\r", " ").split(".") if s.strip()]
-        if sentences and any(s and s[0].islower() for s in sentences):
+        # Only the character right after each period matters; blank segments never start lowercase
+        if any(s[:1].islower() for s in text.split(".")):
             findings.append({
                 "categoria": "gramatica",
                 "descripcion": "Algunas oraciones parecen comenzar en minúscula.",
                 "score": 0.4
             })
 
-        tokens = [t for t in lower.split() if t]
         if len(tokens) < 10:
             findings.append({
                 "categoria": "semantica",
                 "descripcion": "Contenido muy corto — posible falta de información contextual.",
                 "score": 0.6
             })
-        elif len(set(tokens)) < max(3, len(tokens) // 3):
+        elif len(token_set) < max(3, len(tokens) // 3):
             findings.append({
                 "categoria": "semantica",
                 "descripcion": "Contenido con mucha repetición léxica — revisar variedad semántica.",
@@ -217,80 +616,352 @@ class GeminiAnalyzer:
         return findings
 
     def _validate_and_clean_hallazgos(self, hallazgos: List[Dict]) -> List[Dict]:
-        cleaned: List[Dict] = []
-        for h in hallazgos:
-            cat = h.get("categoria", "")
-            if cat not in self.CATEGORIAS_VALIDAS:
-                cat = "semantica"
-            cleaned.append({
-                "categoria": cat,
+        valid = self.CATEGORIAS_VALIDAS
+        return [
+            {
+                "categoria": cat if (cat := h.get("categoria", "")) in valid else "semantica",
                 "descripcion": str(h.get("descripcion", "")).strip(),
                 "score": float(h.get("score", 0.0))
-            })
-        return cleaned
+            }
+            for h in hallazgos
+        ]
 
-    def _analyze_single_page(self, pdf_bytes: bytes, page_num: int) -> List[Dict]:
-        text = self._read_text_from_pdf_bytes(pdf_bytes)
+    def _build_system_prompt(self) -> str:
+        return (
+            "Eres un auditor editorial. Analiza el texto que se te entrega para detectar sesgos "
+            "(género, religión, política) y problemas lingüísticos (ortografía, gramática, semántica). "
+            f"Usa solo estas categorías: {', '.join(sorted(self.CATEGORIAS_VALIDAS))}. "
+            "Cada hallazgo tiene los campos: categoria, descripcion, score (0-1)."
+        )
 
-        # If real Gemini is available, attempt a model call with a structured prompt
-        if self.real_available:
-            prompt = (
-                f"Analiza el siguiente texto para detectar sesgos y problemas lingüísticos. "
-                f"Devuelve hallazgos en forma de lista con campos: categoria, descripcion, score (0-1).\n\nTexto (pagina {page_num}):\n{text}"
+    def _build_page_prompt(self, text: str, page_num: int) -> str:
+        return f"Devuelve los hallazgos en forma de lista.\n\nTexto (pagina {page_num}):\n{text}"
+
+    def _get_response_schema(self) -> Dict:
+        """JSON schema for multi-page requests: findings grouped by PDF page."""
+        hallazgo = {
+            "type": "OBJECT",
+            "properties": {
+                "categoria": {"type": "STRING", "enum": sorted(self.CATEGORIAS_VALIDAS)},
+                "descripcion": {"type": "STRING"},
+                "score": {"type": "NUMBER"},
+            },
+            "required": ["categoria", "descripcion", "score"],
+        }
+        return {
+            "type": "OBJECT",
+            "properties": {
+                "hallazgos_por_pagina": {
+                    "type": "ARRAY",
+                    "items": {
+                        "type": "OBJECT",
+                        "properties": {
+                            "pagina_pdf": {"type": "INTEGER"},
+                            "hallazgos": {"type": "ARRAY", "items": hallazgo},
+                        },
+                        "required": ["pagina_pdf", "hallazgos"],
+                    },
+                },
+            },
+            "required": ["hallazgos_por_pagina"],
+        }
+
+    def _build_chunk_prompt(self, pages: List[Tuple[int, str]]) -> str:
+        body = "\n\n".join(f"=== Pagina {p} ===\n{text}" for p, text in pages)
+        return (
+            "Devuelve un objeto JSON con hallazgos_por_pagina: una entrada por página con pagina_pdf "
+            f"y su lista de hallazgos.\n\n{body}"
+        )
+
+    def _parse_chunk_response(
+        self, model_output: Optional[str], pages: List[int]
+    ) -> Optional[Dict[int, List[Dict]]]:
+        """
+        Map pagina_pdf -> cleaned hallazgos from a multi-page response.
+        None if it isn't valid JSON, any item doesn't have the hallazgo shape (a dict with a numeric score)
+        or any of the requested pages has no entry.
+        """
+        if not model_output:
+            return None
+        try:
+            data = _json_loads(model_output)
+            by_page = {}
+            for e in data["hallazgos_por_pagina"]:
+                hallazgos = list(e.get("hallazgos") or [])
+                for h in hallazgos:
+                    if not isinstance(h, dict) or not isinstance(h.get("score", 0.0), (int, float)):
+                        raise ValueError(f"malformed hallazgo: {h!r:.200}")
+                by_page[int(e["pagina_pdf"])] = self._validate_and_clean_hallazgos(hallazgos)
+            missing = [p for p in pages if p not in by_page]
+            if missing:
+                raise ValueError(f"no entry for pages {missing}")
+            return by_page
+        except (ValueError, KeyError, TypeError, AttributeError) as e:  # orjson.JSONDecodeError is a ValueError
+            logger.warning("Could not parse multi-page Gemini response: %s", e)
+            return None
+
+    def _findings_from_output(self, model_output: Optional[str], text: str, page_num: int) -> List[Dict]:
+        if model_output:
+            # Best-effort: attempt to interpret model_output if it is JSON-like.
+            return self._validate_and_clean_hallazgos(
+                [{"categoria": "semantica", "descripcion": model_output[:2000], "score": 0.5}]
             )
-            model_output = self._call_gemini(prompt)
-            if model_output:
-                # Best-effort: attempt to interpret model_output if it is JSON-like.
-                return self._validate_and_clean_hallazgos(
-                    [{"categoria": "semantica", "descripcion": model_output[:2000], "score": 0.5}]
-                )
         # Mock fallback
         hallazgos = self._mock_analyze_text(text, page_num)
         return self._validate_and_clean_hallazgos(hallazgos)
 
-    def analyze_pdf_pages(self, pdf_input: bytes, start_page: int = 1, end_page: int = 3) -> List[Dict]:
-        results = []
+    def _fallback_model(self) -> Optional[str]:
+        """Model to retry with after the primary one came back empty or unparseable, if any."""
+        if self.real_available and self.fallback_model_name and self.fallback_model_name != self.model_name:
+            return self.fallback_model_name
+        return None
+
+    def _analyze_page_text(self, text: str, page_num: int) -> List[Dict]:
+        # If real Gemini is available, attempt a model call with a structured prompt
+        model_output = None
+        if self.real_available:
+            prompt = self._build_page_prompt(text, page_num)
+            model_output = self._call_gemini(prompt, config=self._generation_config())
+            # An empty response (e.g. blocked for safety) gets one more try on the fallback model
+            fallback = None if model_output else self._fallback_model()
+            if fallback:
+                model_output = self._call_gemini(
+                    prompt, config=self._generation_config(model_name=fallback), model_name=fallback
+                )
+        return self._findings_from_output(model_output, text, page_num)
 
+    async def _analyze_page_text_async(self, text: str, page_num: int) -> List[Dict]:
+        model_output = None
+        if self.real_available:
+            prompt = self._build_page_prompt(text, page_num)
+            model_output = await self._call_gemini_async(prompt, config=self._generation_config())
+            fallback = None if model_output else self._fallback_model()
+            if fallback:
+                model_output = await self._call_gemini_async(
+                    prompt, config=self._generation_config(model_name=fallback), model_name=fallback
+                )
+        return self._findings_from_output(model_output, text, page_num)
+
+    def _load_pdf_bytes(self, pdf_input: Union[bytes, str, BinaryIO]) -> bytes:
+        """The whole PDF in memory: extraction and the page-text cache key need the full bytes."""
         if isinstance(pdf_input, (bytes, bytearray)):
-            if HAS_PYPDF2:
-                try:
-                    reader = PdfReader(io.BytesIO(pdf_input))
-                    total = len(reader.pages)
-                    s = max(1, start_page)
-                    e = min(end_page, total)
-                    if s > e:
-                        return []
-                    for p in range(s, e + 1):
-                        page_bytes = self._extract_single_page_pdf(pdf_input, p)
-                        findings = self._analyze_single_page(page_bytes, p)
-                        results.append({"page": p, "findings": findings})
-                    return results
-                except Exception as e:
-                    logger.exception("Error reading PDF bytes: %s", e)
-                    findings = self._analyze_single_page(pdf_input, 1)
-                    return [{"page": 1, "findings": findings}]
+            return bytes(pdf_input)
+        if hasattr(pdf_input, "read"):
+            # File-like (e.g. Starlette's SpooledTemporaryFile); may have been read already
+            if hasattr(pdf_input, "seek"):
+                pdf_input.seek(0)
+            return pdf_input.read()
+        with open(str(pdf_input), "rb") as f:
+            return f.read()
+
+    def _page_numbers(self, total_pages: Optional[int], start_page: int, end_page: int) -> List[int]:
+        """Pages to analyze, clamped to the document; falls back to [1] when the PDF can't be read."""
+        if total_pages is None:
+            return [1]
+        return list(range(max(1, start_page), min(end_page, total_pages) + 1))
+
+    def _get_sync_loop(self) -> asyncio.AbstractEventLoop:
+        """
+        The genai client's async HTTP pool is bound to the first loop that uses it, so the sync wrappers
+        can't asyncio.run a fresh loop per call: they all run on this one long-lived loop instead.
+        """
+        with self._sync_loop_lock:
+            if self._sync_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="GeminiAnalyzer-sync", daemon=True).start()
+                self._sync_loop = loop
+            return self._sync_loop
+
+    def _run_sync(self, coro):
+        """Run coro to completion on the shared sync loop; refuse to nest inside one that is already running."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run_coroutine_threadsafe(coro, self._get_sync_loop()).result()
+        coro.close()
+        raise RuntimeError("Called from a running event loop; await the *_async method instead.")
+
+    def analyze_pdf_pages(self, pdf_input: Union[bytes, str, BinaryIO], start_page: int = 1, end_page: int = 3) -> List[Dict]:
+        """
+        Sync wrapper around analyze_pdf_pages_async; pages are still analyzed concurrently.
+        Inside a running event loop (FastAPI, Jupyter) await analyze_pdf_pages_async instead.
+        """
+        return self._run_sync(self.analyze_pdf_pages_async(pdf_input, start_page, end_page))
+
+    async def analyze_pdf_pages_async(
+        self,
+        pdf_input: Union[bytes, str, BinaryIO],
+        start_page: int = 1,
+        end_page: int = 3,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+    ) -> List[Dict]:
+        """
+        Analyze a page range concurrently on the running event loop, at most self.concurrency pages at a time.
+        progress_callback(done, total) fires as each page finishes.
+        """
+        try:
+            pdf_bytes = await asyncio.to_thread(self._load_pdf_bytes, pdf_input)
+        except Exception as e:
+            logger.exception("analyze_pdf_pages_async received unsupported input: %s", e)
+            return []
+
+        # The document is parsed once and page text is read straight from it (PyMuPDF, pypdfium2 or pypdf);
+        # no single-page PDFs are written just to be parsed again
+        digest = await asyncio.to_thread(self._pdf_digest, pdf_bytes)
+        text_doc = await asyncio.to_thread(self._open_text_doc, pdf_bytes)
+        reader = None
+        try:
+            if text_doc is not None:
+                pages = self._page_numbers(text_doc.page_count, start_page, end_page)
             else:
-                findings = self._analyze_single_page(pdf_input, 1)
-                return [{"page": 1, "findings": findings}]
-        else:
+                reader = await asyncio.to_thread(self._open_reader, pdf_bytes)
+                total = self._count_pages(reader) if reader is not None else None
+                pages = self._page_numbers(total, start_page, end_page)
+            if not pages:
+                return []
+
+            def page_text(p: int) -> str:
+                if text_doc is not None:
+                    return self._page_text(text_doc, p)
+                if reader is not None:
+                    return self._reader_page_text(reader, p)
+                return self._read_text_from_pdf_bytes(pdf_bytes)
+
+            # Two-stage pipeline: one producer extracts page text (the shared documents are not thread-safe)
+            # while the workers run the Gemini calls; the bounded queue caps buffered pages.
+            workers = min(self.concurrency, len(pages))
+            queue: "asyncio.Queue[Optional[Tuple[int, str]]]" = asyncio.Queue(maxsize=2 * workers)
+            findings: Dict[int, List[Dict]] = {}
+            done = 0
+
+            async def produce():
+                for p in pages:
+                    await queue.put((p, await asyncio.to_thread(self._cached_page_text, digest, p, page_text)))
+                for _ in range(workers):
+                    await queue.put(None)
+
+            async def consume():
+                nonlocal done
+                while (item := await queue.get()) is not None:
+                    p, text = item
+                    try:
+                        findings[p] = await self._analyze_page_text_async(text, p)
+                    except Exception as e:
+                        logger.error("Page %s analysis failed: %s", p, e)
+                        findings[p] = []
+                    done += 1
+                    if progress_callback:
+                        progress_callback(done, len(pages))
+
+            async with asyncio.TaskGroup() as tg:
+                tg.create_task(produce())
+                for _ in range(workers):
+                    tg.create_task(consume())
+        finally:
+            if text_doc is not None:
+                text_doc.close()
+        return [{"page": p, "findings": findings[p]} for p in pages]
+
+    def analyze_single_page(self, pdf_input: Union[bytes, str, BinaryIO], page_num: int) -> List[Dict]:
+        try:
+            data = self._load_pdf_bytes(pdf_input)
+        except Exception as e:
+            logger.exception("analyze_single_page error: %s", e)
+            return []
+
+        def page_text(p: int) -> str:
+            text_doc = self._open_text_doc(data)
+            if text_doc is not None:
+                with text_doc:
+                    return self._page_text(text_doc, p) if 1 <= p <= text_doc.page_count else ""
+            reader = self._open_reader(data)
+            if reader is not None:
+                return self._reader_page_text(reader, p) if 1 <= p <= self._count_pages(reader) else ""
+            return self._read_text_from_pdf_bytes(data)
+
+        text = self._cached_page_text(self._pdf_digest(data), page_num, page_text)
+        try:
+            return self._analyze_page_text(text, page_num)
+        except Exception as e:
+            logger.error("Page %s analysis failed: %s", page_num, e)
+            return []
+
+    def analyze_pdf_chunked(
+        self, pdf_input: Union[bytes, str, BinaryIO], start_page: int = 1, end_page: int = 3, chunk_size: int = 20
+    ) -> List[Dict]:
+        """Sync wrapper around analyze_pdf_chunked_async."""
+        return self._run_sync(self.analyze_pdf_chunked_async(pdf_input, start_page, end_page, chunk_size))
+
+    async def analyze_pdf_chunked_async(
+        self, pdf_input: Union[bytes, str, BinaryIO], start_page: int = 1, end_page: int = 3, chunk_size: int = 20
+    ) -> List[Dict]:
+        """
+        Like analyze_pdf_pages_async, but sends up to chunk_size pages per Gemini request and asks for
+        findings keyed by pagina_pdf. A chunk whose response can't be parsed falls back to per-page analysis.
+        """
+        try:
+            pdf_bytes = await asyncio.to_thread(self._load_pdf_bytes, pdf_input)
+        except Exception as e:
+            logger.exception("analyze_pdf_chunked_async received unsupported input: %s", e)
+            return []
+
+        def extract_texts() -> List[Tuple[int, str]]:
+            digest = self._pdf_digest(pdf_bytes)
+            text_doc = self._open_text_doc(pdf_bytes)
+            if text_doc is not None:
+                with text_doc:
+                    return [
+                        (p, self._cached_page_text(digest, p, lambda p: self._page_text(text_doc, p)))
+                        for p in self._page_numbers(text_doc.page_count, start_page, end_page)
+                    ]
+            reader = self._open_reader(pdf_bytes)
+            if reader is None:
+                return [(1, self._cached_page_text(digest, 1, lambda p: self._read_text_from_pdf_bytes(pdf_bytes)))]
+            return [
+                (p, self._cached_page_text(digest, p, lambda p: self._reader_page_text(reader, p)))
+                for p in self._page_numbers(self._count_pages(reader), start_page, end_page)
+            ]
+
+        texts = await asyncio.to_thread(extract_texts)
+        if not texts:
+            return []
+        sem = asyncio.Semaphore(self.concurrency)
+
+        async def analyze_page(p: int, text: str) -> List[Dict]:
             try:
-                with open(str(pdf_input), "rb") as f:
-                    data = f.read()
-                return self.analyze_pdf_pages(data, start_page=start_page, end_page=end_page)
+                return await self._analyze_page_text_async(text, p)
             except Exception as e:
-                logger.exception("analyze_pdf_pages received unsupported input: %s", e)
+                logger.error("Page %s analysis failed: %s", p, e)
                 return []
 
-    def analyze_single_page(self, pdf_input: bytes, page_num: int) -> List[Dict]:
-        if isinstance(pdf_input, (bytes, bytearray)):
-            page_bytes = self._extract_single_page_pdf(pdf_input, page_num)
-            return self._analyze_single_page(page_bytes, page_num)
-        else:
+        async def analyze_chunk(chunk: List[Tuple[int, str]]) -> List[Dict]:
             try:
-                with open(str(pdf_input), "rb") as f:
-                    data = f.read()
-                page_bytes = self._extract_single_page_pdf(data, page_num)
-                return self._analyze_single_page(page_bytes, page_num)
+                return await analyze_chunk_pages(chunk)
             except Exception as e:
-                logger.exception("analyze_single_page error: %s", e)
-                return []
\ No newline at end of file
+                logger.error("Pages %s-%s analysis failed: %s", chunk[0][0], chunk[-1][0], e)
+                return [{"page": p, "findings": []} for p, _ in chunk]
+
+        async def analyze_chunk_pages(chunk: List[Tuple[int, str]]) -> List[Dict]:
+            async with sem:
+                if not self.real_available:
+                    return [{"page": p, "findings": self._findings_from_output(None, text, p)} for p, text in chunk]
+                prompt = self._build_chunk_prompt(chunk)
+                pages = [p for p, _ in chunk]
+                config = self._generation_config(pages=len(chunk), json_output=True)
+                parse = functools.partial(self._parse_chunk_response, pages=pages)
+                by_page = await self._call_gemini_async(prompt, config=config, parse=parse)
+                # Output that doesn't match the schema gets one more try on the fallback model
+                fallback = self._fallback_model() if by_page is None else None
+                if fallback:
+                    config = self._generation_config(pages=len(chunk), json_output=True, model_name=fallback)
+                    by_page = await self._call_gemini_async(prompt, config=config, model_name=fallback, parse=parse)
+                if by_page is None:
+                    # Unparseable on every model: the pages go to Gemini one by one instead
+                    return [{"page": p, "findings": await analyze_page(p, text)} for p, text in chunk]
+                return [{"page": p, "findings": by_page[p]} for p, _ in chunk]
+
+        chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+        results: List[Dict] = []
+        for chunk_results in await asyncio.gather(*(analyze_chunk(c) for c in chunks)):
+            results.extend(chunk_results)
+        return results
@@ -1,7 +1,8 @@
 # src.report_generator.py
 
+import csv
+from collections import Counter
 from typing import List, Dict
-import pandas as pd
 
 class ReportGenerator:
     """Generador de tabla Markdown con hallazgos"""
@@ -22,6 +23,14 @@ class ReportGenerator:
         if document_name:
             self.document_name = document_name
 
+    @staticmethod
+    def _truncate_words(texto: str, n: int) -> str:
+        """Recorta texto a n palabras (con '...'), separando en palabras una sola vez"""
+        palabras = texto.split()
+        if len(palabras) > n:
+            return ' '.join(palabras[:n]) + '...'
+        return texto
+
     def generate_markdown_table(self) -> str:
         """
         Genera tabla en formato Markdown según especificación
@@ -57,14 +66,10 @@ class ReportGenerator:
             recomendacion = h.get('recomendacion', '—')
             
             # Limpiar fragmento: max 10 palabras según PRD
-            if fragmento != '—' and len(fragmento.split()) > 10:
-                palabras = fragmento.split()[:10]
-                fragmento = ' '.join(palabras) + '...'
+            fragmento = self._truncate_words(fragmento, 10)
             
             # Limpiar recomendación: max 60 palabras según PRD
-            if recomendacion != '—' and len(recomendacion.split()) > 60:
-                palabras = recomendacion.split()[:60]
-                recomendacion = ' '.join(palabras) + '...'
+            recomendacion = self._truncate_words(recomendacion, 60)
             
             # Escapar pipes en el contenido
             fragmento_escaped = str(fragmento).replace('|', '\\|')
@@ -82,17 +87,9 @@ class ReportGenerator:
         
         total = len(self.hallazgos)
         
-        # Contar por categoría
-        por_categoria = {}
-        for h in self.hallazgos:
-            cat = h.get('categoria', 'unknown')
-            por_categoria[cat] = por_categoria.get(cat, 0) + 1
-        
-        # Contar por prioridad
-        por_prioridad = {}
-        for h in self.hallazgos:
-            pri = h.get('prioridad', 'Media')
-            por_prioridad[pri] = por_prioridad.get(pri, 0) + 1
+        # Contar por categoría y por prioridad
+        por_categoria = Counter(h.get('categoria', 'unknown') for h in self.hallazgos)
+        por_prioridad = Counter(h.get('prioridad', 'Media') for h in self.hallazgos)
         
         # Construir resumen
         lineas = [
@@ -117,15 +114,17 @@ class ReportGenerator:
         if not self.hallazgos:
             return
         
-        df = pd.DataFrame(self.hallazgos)
         columnas = ['categoria', 'prioridad', 'pagina_pdf', 'pagina_libro', 
                    'fragmento_original', 'recomendacion']
         
-        # Reordenar columnas si existen
-        columnas_existentes = [c for c in columnas if c in df.columns]
-        df = df[columnas_existentes]
+        # Solo columnas presentes en algún hallazgo, en el orden definido
+        presentes = set().union(*self.hallazgos)
+        columnas_existentes = [c for c in columnas if c in presentes]
         
-        df.to_csv(filename, index=False, encoding='utf-8-sig')
+        with open(filename, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.DictWriter(f, fieldnames=columnas_existentes, restval='', extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(self.hallazgos)
     
     def clear(self):
         """Limpia todos los hallazgos"""